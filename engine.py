@@ -1,103 +1,474 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+
 import chess
+import chess.polyglot
 from evaluator import PositionEvaluator
 
+TT_EXACT = 0
+TT_LOWER = 1
+TT_UPPER = 2
+
+TT_MAX_ENTRIES = 1 << 20
+
+ASPIRATION_WINDOW = 50
+
+PIECE_ORDER_VALUES = (0, 100, 320, 330, 500, 900, 20000)
+
+MVV_LVA = [
+    [10 * victim - attacker for attacker in PIECE_ORDER_VALUES]
+    for victim in PIECE_ORDER_VALUES
+]
+
+PARALLEL_MIN_DEPTH = 4
+
+NEG_INF = -10**9
+POS_INF = 10**9
+
+NULL_MOVE_REDUCTION = 2
+
+MAX_PLY = 64
+
+def _has_non_pawn_material(board):
+    return (board.occupied_co[board.turn] & ~board.pawns & ~board.kings) != 0
+
+_worker_engine = None
+
+def _search_root_move(task):
+    global _worker_engine
+    if _worker_engine is None:
+        _worker_engine = ChessEngine()
+
+    move, board, depth, alpha, beta = task
+    _worker_engine._init_incremental(board)
+    score = -_worker_engine._negamax(board, depth, -beta, -alpha)
+    return move, score
+
 class ChessEngine:
-    
-    def __init__(self, depth=3):
+
+    def __init__(self, depth=3, parallel=False):
         self.depth = depth
         self.evaluator = PositionEvaluator()
         self.nodes_evaluated = 0
         self.best_move_score = 0
+        self.tt = {}
+        self.parallel = parallel
+        self._pool = None
+        self._inc_material = 0
+        self._inc_pst_middle = 0
+        self._inc_pst_end = 0
+        self._inc_stack = []
+        self.killers = [[None, None] for _ in range(MAX_PLY)]
+        self.history = [[0] * 64 for _ in range(64)]
     
     def find_best_move(self, board, depth=None):
         if depth is None:
             depth = self.depth
-        
+
         self.nodes_evaluated = 0
-        best_move = None
-        best_score = float('-inf')
-        alpha = float('-inf')
-        beta = float('inf')
-        
+
         legal_moves = list(board.legal_moves)
-        legal_moves = self._order_moves(board, legal_moves)
-        
+        if not legal_moves:
+            return None
+
+        self._init_incremental(board)
+
         color_multiplier = 1 if board.turn == chess.WHITE else -1
-        
-        for move in legal_moves:
-            board.push(move)
-            score = -self._negamax(board, depth - 1, -beta, -alpha)
-            board.pop()
-            
+
+        best_move = None
+        best_score = NEG_INF
+        pv_move = None
+
+        for d in range(1, depth + 1):
+            if pv_move is None:
+                alpha = NEG_INF
+                beta = POS_INF
+            else:
+                alpha = best_score - ASPIRATION_WINDOW
+                beta = best_score + ASPIRATION_WINDOW
+
+            move, score = self._search_root(board, legal_moves, d, alpha, beta, pv_move)
+
+            if score <= alpha or score >= beta:
+                move, score = self._search_root(board, legal_moves, d,
+                                                NEG_INF, POS_INF, pv_move)
+
+            best_move = move
+            best_score = score
+            pv_move = best_move
+
+        self.best_move_score = best_score * color_multiplier
+        return best_move
+
+    def _search_root(self, board, legal_moves, depth, alpha, beta, pv_move):
+        ordered = self._order_moves(board, legal_moves, pv_move)
+
+        if self.parallel and depth >= PARALLEL_MIN_DEPTH and len(ordered) > 1:
+            return self._search_root_parallel(board, ordered, depth, alpha, beta)
+
+        best_move = None
+        best_score = NEG_INF
+
+        for move_index, move in enumerate(ordered):
+            self._do_move(board, move)
+            if move_index == 0:
+                score = -self._negamax(board, depth - 1, -beta, -alpha)
+            else:
+                score = -self._negamax(board, depth - 1, -alpha - 1, -alpha)
+                if alpha < score < beta:
+                    score = -self._negamax(board, depth - 1, -beta, -score)
+            self._undo_move(board)
+
             if score > best_score:
                 best_score = score
                 best_move = move
-            
-            alpha = max(alpha, score)
-        
-        self.best_move_score = best_score * color_multiplier
-        return best_move
+
+            if score > alpha:
+                alpha = score
+            if alpha >= beta:
+                break
+
+        return best_move, best_score
+
+    def _search_root_parallel(self, board, ordered, depth, alpha, beta):
+        best_move = ordered[0]
+        self._do_move(board, best_move)
+        best_score = -self._negamax(board, depth - 1, -beta, -alpha)
+        self._undo_move(board)
+
+        if best_score > alpha:
+            alpha = best_score
+        if alpha >= beta:
+            return best_move, best_score
+
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(max_workers=os.cpu_count())
+
+        tasks = []
+        for move in ordered[1:]:
+            child = board.copy(stack=False)
+            child.push(move)
+            tasks.append((move, child, depth - 1, alpha, beta))
+
+        for move, score in self._pool.map(_search_root_move, tasks):
+            if score > best_score:
+                best_score = score
+                best_move = move
+
+        return best_move, best_score
     
-    def _negamax(self, board, depth, alpha, beta):
+    def _negamax(self, board, depth, alpha, beta, ply=1):
         self.nodes_evaluated += 1
-        
-        if depth == 0 or board.is_game_over():
-            eval_score = self.evaluator.evaluate_position(board)
+
+        if board.is_game_over():
+            eval_score = self.evaluator.evaluate_position(board, self._incremental())
             color_multiplier = 1 if board.turn == chess.WHITE else -1
             return eval_score * color_multiplier
-        
-        legal_moves = list(board.legal_moves)
-        legal_moves = self._order_moves(board, legal_moves)
-        
-        max_score = float('-inf')
-        for move in legal_moves:
-            board.push(move)
-            score = -self._negamax(board, depth - 1, -beta, -alpha)
+
+        if depth == 0:
+            return self._quiescence(board, alpha, beta)
+
+        alpha_orig = alpha
+        key = chess.polyglot.zobrist_hash(board)
+        entry = self.tt.get(key)
+        tt_move = None
+
+        if entry is not None:
+            tt_move = entry[3]
+            if entry[0] >= depth:
+                if entry[2] == TT_EXACT:
+                    return entry[1]
+                elif entry[2] == TT_LOWER:
+                    alpha = max(alpha, entry[1])
+                elif entry[2] == TT_UPPER:
+                    beta = min(beta, entry[1])
+                if alpha >= beta:
+                    return entry[1]
+
+        in_check = board.is_check()
+
+        if (depth >= 3 and not in_check
+                and _has_non_pawn_material(board)
+                and not self.evaluator._is_endgame(board)):
+            board.push(chess.Move.null())
+            score = -self._negamax(board, depth - 1 - NULL_MOVE_REDUCTION,
+                                   -beta, -beta + 1, ply + 1)
             board.pop()
-            
-            max_score = max(max_score, score)
-            alpha = max(alpha, score)
-            
-            if beta <= alpha:
+            if score >= beta:
+                return beta
+
+        legal_moves = list(board.legal_moves)
+        legal_moves = self._order_moves(board, legal_moves, tt_move, ply)
+
+        do_move = self._do_move
+        undo_move = self._undo_move
+        negamax = self._negamax
+
+        max_score = NEG_INF
+        best_move_here = None
+        for move_index, move in enumerate(legal_moves):
+            reducible = (depth >= 3 and move_index >= 3 and not in_check
+                         and not board.is_capture(move)
+                         and not move.promotion
+                         and not board.gives_check(move))
+
+            do_move(board, move)
+            if move_index == 0:
+                score = -negamax(board, depth - 1, -beta, -alpha, ply + 1)
+            else:
+                if reducible:
+                    reduction = 1 + (move_index > 6)
+                    score = -negamax(board, depth - 1 - reduction,
+                                     -alpha - 1, -alpha, ply + 1)
+                else:
+                    score = -negamax(board, depth - 1, -alpha - 1, -alpha, ply + 1)
+
+                if alpha < score < beta:
+                    score = -negamax(board, depth - 1, -beta, -score, ply + 1)
+            undo_move(board)
+
+            if score > max_score:
+                max_score = score
+                best_move_here = move
+            if score > alpha:
+                alpha = score
+
+            if alpha >= beta:
+                if not board.is_capture(move) and not move.promotion:
+                    self._record_quiet_cutoff(move, depth, ply)
                 break
-        
+
+        self._store_tt(key, depth, max_score, alpha_orig, beta, best_move_here)
+
         return max_score
-    
-    def _order_moves(self, board, moves):
-        def move_priority(move):
+
+    def _quiescence(self, board, alpha, beta):
+        self.nodes_evaluated += 1
+
+        color_multiplier = 1 if board.turn == chess.WHITE else -1
+        stand_pat = self.evaluator.evaluate_position(board, self._incremental())
+        stand_pat *= color_multiplier
+
+        if stand_pat >= beta:
+            return beta
+        if stand_pat > alpha:
+            alpha = stand_pat
+
+        captures = []
+        for move in board.generate_legal_captures():
+            victim = board.piece_type_at(move.to_square)
+            if not victim:
+                continue
+            attacker = board.piece_type_at(move.from_square)
+
+            if (PIECE_ORDER_VALUES[victim] < PIECE_ORDER_VALUES[attacker]
+                    and board.attackers_mask(not board.turn, move.to_square)):
+                continue
+
+            captures.append((MVV_LVA[victim][attacker], move))
+
+        captures.sort(reverse=True, key=lambda entry: entry[0])
+
+        for _, move in captures:
+            self._do_move(board, move)
+            score = -self._quiescence(board, -beta, -alpha)
+            self._undo_move(board)
+
+            if score >= beta:
+                return beta
+            if score > alpha:
+                alpha = score
+
+        return alpha
+
+    def _store_tt(self, key, depth, score, alpha_orig, beta, best_move):
+        if score <= alpha_orig:
+            flag = TT_UPPER
+        elif score >= beta:
+            flag = TT_LOWER
+        else:
+            flag = TT_EXACT
+
+        existing = self.tt.get(key)
+        if existing is not None and existing[0] > depth:
+            return
+        if existing is None and len(self.tt) >= TT_MAX_ENTRIES:
+            return
+
+        self.tt[key] = (depth, score, flag, best_move)
+
+    def _record_quiet_cutoff(self, move, depth, ply):
+        if ply < MAX_PLY:
+            killers = self.killers[ply]
+            if move != killers[0]:
+                killers[1] = killers[0]
+                killers[0] = move
+        self.history[move.from_square][move.to_square] += depth * depth
+
+    def _init_incremental(self, board):
+        flat_middle = self.evaluator._flat_pst_middle
+        flat_end = self.evaluator._flat_pst_end
+        piece_values = self.evaluator.PIECE_VALUES
+
+        material = 0
+        pst_middle = 0
+        pst_end = 0
+
+        for square, piece in board.piece_map().items():
+            index = piece.color * 6 + piece.piece_type - 1
+            pst_middle += flat_middle[index][square]
+            pst_end += flat_end[index][square]
+            if piece.piece_type != chess.KING:
+                value = piece_values[piece.piece_type]
+                material += value if piece.color else -value
+
+        self._inc_material = material
+        self._inc_pst_middle = pst_middle
+        self._inc_pst_end = pst_end
+        self._inc_stack.clear()
+
+    def _do_move(self, board, move):
+        self._inc_stack.append(
+            (self._inc_material, self._inc_pst_middle, self._inc_pst_end)
+        )
+
+        flat_middle = self.evaluator._flat_pst_middle
+        flat_end = self.evaluator._flat_pst_end
+        piece_values = self.evaluator.PIECE_VALUES
+
+        color = board.turn
+        sign = 1 if color == chess.WHITE else -1
+        base = color * 6 - 1
+
+        material = self._inc_material
+        pst_middle = self._inc_pst_middle
+        pst_end = self._inc_pst_end
+
+        moving = board.piece_type_at(move.from_square)
+
+        if board.is_en_passant(move):
+            victim = chess.PAWN
+            victim_square = move.to_square - 8 * sign
+        else:
+            victim = board.piece_type_at(move.to_square)
+            victim_square = move.to_square
+
+        index = base + moving
+        pst_middle -= flat_middle[index][move.from_square]
+        pst_end -= flat_end[index][move.from_square]
+
+        placed = move.promotion if move.promotion else moving
+        index = base + placed
+        pst_middle += flat_middle[index][move.to_square]
+        pst_end += flat_end[index][move.to_square]
+
+        if move.promotion:
+            material += sign * (piece_values[move.promotion] - piece_values[chess.PAWN])
+
+        if victim:
+            index = (not color) * 6 - 1 + victim
+            pst_middle -= flat_middle[index][victim_square]
+            pst_end -= flat_end[index][victim_square]
+            material += sign * piece_values[victim]
+
+        if board.is_castling(move):
+            rank = 0 if color == chess.WHITE else 7
+            if chess.square_file(move.to_square) > chess.square_file(move.from_square):
+                rook_from = chess.square(7, rank)
+                rook_to = chess.square(5, rank)
+            else:
+                rook_from = chess.square(0, rank)
+                rook_to = chess.square(3, rank)
+
+            index = base + chess.ROOK
+            pst_middle += flat_middle[index][rook_to] - flat_middle[index][rook_from]
+            pst_end += flat_end[index][rook_to] - flat_end[index][rook_from]
+
+        self._inc_material = material
+        self._inc_pst_middle = pst_middle
+        self._inc_pst_end = pst_end
+
+        board.push(move)
+
+    def _undo_move(self, board):
+        board.pop()
+        (self._inc_material,
+         self._inc_pst_middle,
+         self._inc_pst_end) = self._inc_stack.pop()
+
+    def _incremental(self):
+        return (self._inc_material, self._inc_pst_middle, self._inc_pst_end)
+
+    def _order_moves(self, board, moves, tt_move=None, ply=0):
+        if tt_move is not None and tt_move not in moves:
+            tt_move = None
+
+        killers = self.killers[ply] if ply < MAX_PLY else (None, None)
+        history = self.history
+
+        tactical = []
+        quiet = []
+        losing = []
+
+        for move in moves:
+            if move == tt_move:
+                continue
+
             score = 0
-            
-            if board.is_capture(move):
-                captured_piece = board.piece_at(move.to_square)
-                moving_piece = board.piece_at(move.from_square)
-                if captured_piece and moving_piece:
-                    score += 10 * self.evaluator.PIECE_VALUES[captured_piece.piece_type]
-                    score -= self.evaluator.PIECE_VALUES[moving_piece.piece_type]
-            
+            is_losing = False
+
+            victim = board.piece_type_at(move.to_square)
+            if victim:
+                attacker = board.piece_type_at(move.from_square)
+                score = MVV_LVA[victim][attacker]
+
+                if (PIECE_ORDER_VALUES[victim] < PIECE_ORDER_VALUES[attacker]
+                        and board.attackers_mask(not board.turn, move.to_square)):
+                    is_losing = True
+
             if move.promotion:
-                score += self.evaluator.PIECE_VALUES[move.promotion]
-            
-            board.push(move)
-            if board.is_check():
-                score += 50
-            board.pop()
-            
-            return score
-        
-        return sorted(moves, key=move_priority, reverse=True)
+                score += PIECE_ORDER_VALUES[move.promotion]
+
+            if is_losing:
+                losing.append((score, move))
+            elif score or board.is_capture(move):
+                if board.gives_check(move):
+                    score += 50
+                tactical.append((score, move))
+            elif board.gives_check(move):
+                tactical.append((50, move))
+            elif move == killers[0]:
+                quiet.append((9000, move))
+            elif move == killers[1]:
+                quiet.append((8000, move))
+            else:
+                quiet.append((history[move.from_square][move.to_square], move))
+
+        tactical.sort(reverse=True, key=lambda entry: entry[0])
+        quiet.sort(reverse=True, key=lambda entry: entry[0])
+        losing.sort(reverse=True, key=lambda entry: entry[0])
+
+        ordered = [move for _, move in tactical]
+        ordered.extend(move for _, move in quiet)
+        ordered.extend(move for _, move in losing)
+        if tt_move is not None:
+            ordered.insert(0, tt_move)
+        return ordered
     
     def analyze_position(self, board, num_top_moves=5):
         legal_moves = list(board.legal_moves)
         if not legal_moves:
             return []
         
+        self._init_incremental(board)
+
         move_scores = []
         color_multiplier = 1 if board.turn == chess.WHITE else -1
-        
+
         for move in legal_moves:
-            board.push(move)
-            score = -self._negamax(board, self.depth - 1, float('-inf'), float('inf'))
-            board.pop()
+            self._do_move(board, move)
+            score = -self._negamax(board, self.depth - 1, NEG_INF, POS_INF)
+            self._undo_move(board)
             move_scores.append((move, score * color_multiplier))
         
         move_scores.sort(key=lambda x: x[1], reverse=True)
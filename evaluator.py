@@ -1,4 +1,18 @@
 import chess
+import chess.polyglot
+
+try:
+    import numpy as np
+    from numba import njit
+    HAS_NUMBA = True
+except ImportError:
+    HAS_NUMBA = False
+
+FILES = chess.BB_FILES
+NEIGHBOR_FILES = [
+    (FILES[f - 1] if f > 0 else 0) | (FILES[f + 1] if f < 7 else 0)
+    for f in range(8)
+]
 
 class PositionEvaluator:
     
@@ -97,102 +111,137 @@ class PositionEvaluator:
             chess.QUEEN: self.QUEEN_TABLE,
             chess.KING: self.KING_MIDDLE_TABLE
         }
+
+        self._pst = {chess.WHITE: {}, chess.BLACK: {}}
+        for piece_type, table in self.position_tables.items():
+            self._pst[chess.WHITE][piece_type] = tuple(table)
+            self._pst[chess.BLACK][piece_type] = tuple(
+                -table[chess.square_mirror(sq)] for sq in range(64)
+            )
+
+        self._king_end_pst = {
+            chess.WHITE: tuple(self.KING_END_TABLE),
+            chess.BLACK: tuple(
+                -self.KING_END_TABLE[chess.square_mirror(sq)] for sq in range(64)
+            )
+        }
+
+        middle = []
+        endgame = []
+        for color in (chess.BLACK, chess.WHITE):
+            for piece_type in chess.PIECE_TYPES:
+                middle.append(self._pst[color][piece_type])
+                if piece_type == chess.KING:
+                    endgame.append(self._king_end_pst[color])
+                else:
+                    endgame.append(self._pst[color][piece_type])
+        self._flat_pst_middle = tuple(middle)
+        self._flat_pst_end = tuple(endgame)
+
+        self._eval_cache = {}
+        self._MAX_EVAL_CACHE = 1 << 20
     
-    def evaluate_position(self, board):
+    def evaluate_position(self, board, incremental=None):
         if board.is_checkmate():
             return -20000 if board.turn else 20000
-        
+
         if board.is_stalemate() or board.is_insufficient_material():
             return 0
-        
-        score = 0
-        
-        score += self._evaluate_material(board)
-        score += self._evaluate_piece_positioning(board)
+
+        key = chess.polyglot.zobrist_hash(board)
+        cached = self._eval_cache.get(key)
+        if cached is not None:
+            return cached
+
+        if incremental is not None:
+            material, pst_middle, pst_end = incremental
+            score = material + (pst_end if self._is_endgame(board) else pst_middle)
+            score += self._evaluate_pawn_structure(board)
+        elif HAS_NUMBA:
+            score = int(_eval_packed(_pack_board(board), self._is_endgame(board)))
+        else:
+            score = self._evaluate_material(board)
+            score += self._evaluate_piece_positioning(board)
+            score += self._evaluate_pawn_structure(board)
+
         score += self._evaluate_mobility(board)
-        score += self._evaluate_pawn_structure(board)
         score += self._evaluate_king_safety(board)
-        
+
+        if len(self._eval_cache) < self._MAX_EVAL_CACHE:
+            self._eval_cache[key] = score
+
         return score
     
     def _evaluate_material(self, board):
         score = 0
-        for piece_type in [chess.PAWN, chess.KNIGHT, chess.BISHOP, chess.ROOK, chess.QUEEN]:
-            score += len(board.pieces(piece_type, chess.WHITE)) * self.PIECE_VALUES[piece_type]
-            score -= len(board.pieces(piece_type, chess.BLACK)) * self.PIECE_VALUES[piece_type]
+        white = board.occupied_co[chess.WHITE]
+        black = board.occupied_co[chess.BLACK]
+
+        masks = (board.pawns, board.knights, board.bishops, board.rooks, board.queens)
+        for piece_type, mask in enumerate(masks, start=1):
+            value = self.PIECE_VALUES[piece_type]
+            score += (mask & white).bit_count() * value
+            score -= (mask & black).bit_count() * value
+
         return score
     
     def _evaluate_piece_positioning(self, board):
         score = 0
-        is_endgame = self._is_endgame(board)
-        
-        for square in chess.SQUARES:
-            piece = board.piece_at(square)
-            if piece is None:
-                continue
-            
-            piece_type = piece.piece_type
-            color = piece.color
-            
-            if piece_type == chess.KING:
-                table = self.KING_END_TABLE if is_endgame else self.KING_MIDDLE_TABLE
-            else:
-                table = self.position_tables.get(piece_type, [0] * 64)
-            
-            table_square = square if color == chess.WHITE else chess.square_mirror(square)
-            position_value = table[table_square]
-            
-            if color == chess.WHITE:
-                score += position_value
-            else:
-                score -= position_value
-        
+        flat = self._flat_pst_end if self._is_endgame(board) else self._flat_pst_middle
+
+        for color in (chess.WHITE, chess.BLACK):
+            base = color * 6 - 1
+            for piece_type in chess.PIECE_TYPES:
+                pst = flat[base + piece_type]
+
+                bb = int(board.pieces_mask(piece_type, color))
+                while bb:
+                    square = (bb & -bb).bit_length() - 1
+                    score += pst[square]
+                    bb &= bb - 1
+
         return score
     
     def _evaluate_mobility(self, board):
-        original_turn = board.turn
-        
-        board.turn = chess.WHITE
-        white_mobility = board.legal_moves.count()
-        
-        board.turn = chess.BLACK
-        black_mobility = board.legal_moves.count()
-        
-        board.turn = original_turn
-        
-        return (white_mobility - black_mobility) * 10
+        score = 0
+        movers = board.knights | board.bishops | board.rooks | board.queens
+
+        for color in (chess.WHITE, chess.BLACK):
+            pieces = int(movers & board.occupied_co[color])
+            attacks = 0
+            while pieces:
+                square = (pieces & -pieces).bit_length() - 1
+                attacks |= board.attacks_mask(square)
+                pieces &= pieces - 1
+
+            mobility = attacks.bit_count() * 2
+            if color == chess.WHITE:
+                score += mobility
+            else:
+                score -= mobility
+
+        return score
     
     def _evaluate_pawn_structure(self, board):
         score = 0
-        
-        white_pawns = board.pieces(chess.PAWN, chess.WHITE)
-        black_pawns = board.pieces(chess.PAWN, chess.BLACK)
-        
+
+        white_pawns = int(board.pawns & board.occupied_co[chess.WHITE])
+        black_pawns = int(board.pawns & board.occupied_co[chess.BLACK])
+
         for file in range(8):
-            white_file_pawns = sum(1 for sq in white_pawns if chess.square_file(sq) == file)
-            black_file_pawns = sum(1 for sq in black_pawns if chess.square_file(sq) == file)
-            
-            if white_file_pawns > 1:
-                score -= 10 * (white_file_pawns - 1)
-            if black_file_pawns > 1:
-                score += 10 * (black_file_pawns - 1)
-        
-        for pawn_square in white_pawns:
-            file = chess.square_file(pawn_square)
-            if file > 0:
-                if not any(chess.square_file(sq) == file - 1 for sq in white_pawns):
-                    if file < 7:
-                        if not any(chess.square_file(sq) == file + 1 for sq in white_pawns):
-                            score -= 15
-        
-        for pawn_square in black_pawns:
-            file = chess.square_file(pawn_square)
-            if file > 0:
-                if not any(chess.square_file(sq) == file - 1 for sq in black_pawns):
-                    if file < 7:
-                        if not any(chess.square_file(sq) == file + 1 for sq in black_pawns):
-                            score += 15
-        
+            white_on_file = (white_pawns & FILES[file]).bit_count()
+            black_on_file = (black_pawns & FILES[file]).bit_count()
+
+            if white_on_file > 1:
+                score -= 10 * (white_on_file - 1)
+            if black_on_file > 1:
+                score += 10 * (black_on_file - 1)
+
+            if white_on_file and white_pawns & NEIGHBOR_FILES[file] == 0:
+                score -= 15 * white_on_file
+            if black_on_file and black_pawns & NEIGHBOR_FILES[file] == 0:
+                score += 15 * black_on_file
+
         return score
     
     def _evaluate_king_safety(self, board):
@@ -214,10 +263,101 @@ class PositionEvaluator:
         return score
     
     def _is_endgame(self, board):
-        queens = len(board.pieces(chess.QUEEN, chess.WHITE)) + len(board.pieces(chess.QUEEN, chess.BLACK))
-        minor_pieces = (len(board.pieces(chess.KNIGHT, chess.WHITE)) + 
-                       len(board.pieces(chess.BISHOP, chess.WHITE)) +
-                       len(board.pieces(chess.KNIGHT, chess.BLACK)) + 
-                       len(board.pieces(chess.BISHOP, chess.BLACK)))
-        
-        return queens == 0 or (queens == 2 and minor_pieces <= 2)
+        queens = board.queens.bit_count()
+        if queens == 0:
+            return True
+        if queens != 2:
+            return False
+
+        return (board.knights | board.bishops).bit_count() <= 2
+
+if HAS_NUMBA:
+    _JIT_VALUES = np.zeros(7, dtype=np.int16)
+    for _pt, _value in PositionEvaluator.PIECE_VALUES.items():
+        _JIT_VALUES[_pt] = _value
+
+    _JIT_PST = np.zeros((7, 64), dtype=np.int16)
+    _JIT_PST[chess.PAWN] = PositionEvaluator.PAWN_TABLE
+    _JIT_PST[chess.KNIGHT] = PositionEvaluator.KNIGHT_TABLE
+    _JIT_PST[chess.BISHOP] = PositionEvaluator.BISHOP_TABLE
+    _JIT_PST[chess.ROOK] = PositionEvaluator.ROOK_TABLE
+    _JIT_PST[chess.QUEEN] = PositionEvaluator.QUEEN_TABLE
+    _JIT_PST[chess.KING] = PositionEvaluator.KING_MIDDLE_TABLE
+
+    _JIT_KING_END = np.array(PositionEvaluator.KING_END_TABLE, dtype=np.int16)
+
+    def _pack_board(board):
+        arr = np.zeros(64, dtype=np.int8)
+        masks = (board.pawns, board.knights, board.bishops,
+                 board.rooks, board.queens, board.kings)
+
+        for piece_type, mask in enumerate(masks, start=1):
+            white = int(mask & board.occupied_co[chess.WHITE])
+            while white:
+                arr[(white & -white).bit_length() - 1] = piece_type
+                white &= white - 1
+
+            black = int(mask & board.occupied_co[chess.BLACK])
+            while black:
+                arr[(black & -black).bit_length() - 1] = -piece_type
+                black &= black - 1
+
+        return arr
+
+    @njit(cache=True)
+    def _eval_packed(arr, endgame):
+        score = 0
+        white_file_pawns = np.zeros(8, dtype=np.int32)
+        black_file_pawns = np.zeros(8, dtype=np.int32)
+
+        for square in range(64):
+            packed = arr[square]
+            if packed == 0:
+                continue
+
+            if packed > 0:
+                piece_type = packed
+                if piece_type != chess.KING:
+                    score += _JIT_VALUES[piece_type]
+                if piece_type == chess.KING and endgame:
+                    score += _JIT_KING_END[square]
+                else:
+                    score += _JIT_PST[piece_type, square]
+                if piece_type == chess.PAWN:
+                    white_file_pawns[square & 7] += 1
+            else:
+                piece_type = -packed
+                mirrored = square ^ 56
+                if piece_type != chess.KING:
+                    score -= _JIT_VALUES[piece_type]
+                if piece_type == chess.KING and endgame:
+                    score -= _JIT_KING_END[mirrored]
+                else:
+                    score -= _JIT_PST[piece_type, mirrored]
+                if piece_type == chess.PAWN:
+                    black_file_pawns[square & 7] += 1
+
+        for file in range(8):
+            white_on_file = white_file_pawns[file]
+            black_on_file = black_file_pawns[file]
+
+            if white_on_file > 1:
+                score -= 10 * (white_on_file - 1)
+            if black_on_file > 1:
+                score += 10 * (black_on_file - 1)
+
+            white_neighbors = 0
+            black_neighbors = 0
+            if file > 0:
+                white_neighbors += white_file_pawns[file - 1]
+                black_neighbors += black_file_pawns[file - 1]
+            if file < 7:
+                white_neighbors += white_file_pawns[file + 1]
+                black_neighbors += black_file_pawns[file + 1]
+
+            if white_on_file and white_neighbors == 0:
+                score -= 15 * white_on_file
+            if black_on_file and black_neighbors == 0:
+                score += 15 * black_on_file
+
+        return score